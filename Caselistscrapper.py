@@ -28,23 +28,33 @@ PDF CONVERSION:
 """
 
 import requests
+import base64
 import hashlib
 import time
-import io
 import os
-import copy
 import json
+import zipfile
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from docx import Document
 from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml import OxmlElement, parse_xml
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+try:
+    import orjson  # optional: faster JSON cache reads/writes
+except ImportError:
+    orjson = None
+
 # ═══════════════════════════════════════════════════════════════
 #  CONFIGURATION — EDIT THIS SECTION
 # ═══════════════════════════════════════════════════════════════
@@ -75,6 +85,10 @@ OUTPUT_DIR  = Path("caselist_output")
 CACHE_DIR   = OUTPUT_DIR / "cache"
 OUTPUT_NAME = "compiled_blocks"
 
+# Network settings
+MAX_WORKERS          = 8    # parallel API fetches / file downloads
+MAX_REQUESTS_PER_SEC = 20   # politeness cap shared by all workers
+
 # ═══════════════════════════════════════════════════════════════
 
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -88,6 +102,53 @@ session.headers.update({
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
     "Referer": "https://opencaselist.com/",
 })
+# Pool sized for the download workers so keep-alive connections are reused.
+# The adapter only retries failed connects (nothing reached the server);
+# HTTP errors and 429s are retried by api_get / download_file alone, so
+# every attempt goes through _throttle() and _record_status.
+session.mount("https://", HTTPAdapter(
+    pool_connections=32, pool_maxsize=32,
+    max_retries=Retry(connect=2, read=0, backoff_factor=0.5,
+                      respect_retry_after_header=False),
+))
+
+_MIN_DELAY = 1.0 / MAX_REQUESTS_PER_SEC
+_MAX_DELAY = 10.0
+
+_throttle_lock = threading.Lock()
+_next_request_at = 0.0
+_delay = _MIN_DELAY
+_print_lock = threading.Lock()
+
+
+def _log(msg):
+    """print() for worker threads, so concurrent progress lines don't interleave."""
+    with _print_lock:
+        print(msg)
+
+
+def _throttle():
+    """Space requests out by the current adaptive delay across all threads."""
+    global _next_request_at
+    with _throttle_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + _delay
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _record_status(status_code):
+    """
+    Adapts request spacing: a 429 doubles the delay (up to _MAX_DELAY),
+    a success halves it back toward the MAX_REQUESTS_PER_SEC floor.
+    """
+    global _delay
+    with _throttle_lock:
+        if status_code == 429:
+            _delay = min(_delay * 2, _MAX_DELAY)
+        elif status_code < 400:
+            _delay = max(_delay / 2, _MIN_DELAY)
 
 
 # ───────────────────────────────────────────────────────────────
@@ -185,19 +246,78 @@ def prompt_optional_topic_filter():
 #  API HELPERS
 # ───────────────────────────────────────────────────────────────
 
-def api_get(url, params=None, retries=3):
+def _cache_path(text, prefix="", suffix=""):
+    """
+    Cache file for text, named by its blake2b digest in URL-safe base64
+    (22 chars). A file still under the older md5-hex name is renamed on
+    first use so existing caches stay warm.
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    key = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+    path = CACHE_DIR / f"{prefix}{key}{suffix}"
+    if not path.exists():
+        # usedforsecurity=False: plain md5() raises on FIPS-mode OpenSSL
+        legacy_key = hashlib.md5(text.encode(), usedforsecurity=False).hexdigest()
+        legacy = CACHE_DIR / f"{prefix}{legacy_key}{suffix}"
+        try:
+            legacy.replace(path)
+        except OSError:
+            pass  # no legacy file, or another worker already moved it
+    return path
+
+
+def _read_json(path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return json.loads(path.read_text())
+
+
+def _write_json(path, obj):
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(obj))
+    else:
+        path.write_text(json.dumps(obj))
+
+
+NOT_MODIFIED = object()  # api_get result for a 304 on a conditional request
+
+
+def api_get(url, params=None, retries=3, validators=None):
+    """
+    GET url and return the decoded JSON, or None on 404/failure.
+    If validators is a dict (an earlier response's "etag" and
+    "last_modified"), the request is conditional: a 304 returns
+    NOT_MODIFIED, and a 200 refreshes validators in place.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
     for attempt in range(retries):
         try:
-            r = session.get(url, params=params, timeout=15)
+            _throttle()
+            r = session.get(url, params=params, headers=headers, timeout=15)
+            _record_status(r.status_code)
             if r.status_code == 429:
                 wait = 10 * (attempt + 1)
-                print(f"  [rate limit] waiting {wait}s...")
+                _log(f"  [rate limit] waiting {wait}s...")
                 time.sleep(wait)
                 continue
             if r.status_code == 404:
                 return None
+            if r.status_code == 304 and headers:
+                return NOT_MODIFIED
             r.raise_for_status()
-            return r.json()
+            data = r.json()
+            if validators is not None:
+                validators.clear()
+                if r.headers.get("ETag"):
+                    validators["etag"] = r.headers["ETag"]
+                if r.headers.get("Last-Modified"):
+                    validators["last_modified"] = r.headers["Last-Modified"]
+            return data
         except Exception:
             if attempt == retries - 1:
                 return None
@@ -223,21 +343,41 @@ def fetch_teams_in_school(school):
 
 
 def fetch_rounds(school, team):
-    cache_key = hashlib.md5(f"{CASELIST}{school}{team}".encode()).hexdigest()
-    cache_file = CACHE_DIR / f"rounds_{cache_key}.json"
+    cache_file = _cache_path(f"{CASELIST}{school}{team}", "rounds_", ".json")
+    validators_file = cache_file.with_suffix(".meta.json")
     if cache_file.exists() and (time.time() - cache_file.stat().st_mtime) < 3600:
-        return json.loads(cache_file.read_text())
+        return _read_json(cache_file)
+
+    # Stale cache: revalidate (ETag / Last-Modified) instead of refetching
+    validators = {}
+    if cache_file.exists() and validators_file.exists():
+        try:
+            validators = _read_json(validators_file)
+        except (OSError, ValueError):
+            pass  # unreadable / truncated: just refetch unconditionally
+        if not isinstance(validators, dict):
+            validators = {}
 
     # Try two URL patterns
-    data = api_get(f"{API_BASE}/caselists/{CASELIST}/schools/{school}/teams/{team}/rounds")
+    data = api_get(f"{API_BASE}/caselists/{CASELIST}/schools/{school}/teams/{team}/rounds",
+                   validators=validators)
     if data is None:
-        data = api_get(f"{API_BASE}/caselists/{CASELIST}/teams/{school}/{team}/rounds")
+        data = api_get(f"{API_BASE}/caselists/{CASELIST}/teams/{school}/{team}/rounds",
+                       validators=validators)
+    if data is NOT_MODIFIED:
+        cache_file.touch()
+        return _read_json(cache_file)
     if not data:
         return []
 
     rounds = data if isinstance(data, list) else data.get("rounds", [])
-    cache_file.write_text(json.dumps(rounds))
-    time.sleep(0.3)
+    _write_json(cache_file, rounds)
+    if validators:
+        _write_json(validators_file, validators)
+    else:
+        # No ETag/Last-Modified on this response: old validators no
+        # longer describe the cached body
+        validators_file.unlink(missing_ok=True)
     return rounds
 
 
@@ -249,6 +389,30 @@ def fetch_rounds(school, team):
 TARGET_MODE = "teams"  # will be overwritten by prompt
 
 
+def _obj_name(obj, key):
+    return obj if isinstance(obj, str) else obj.get(key, "")
+
+
+def _school_team_pairs(schools):
+    """(school, team) for every team in schools; team lists fetched concurrently."""
+    schools = [s for s in schools if s]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        team_lists = list(pool.map(fetch_teams_in_school, schools))
+    return [
+        (school, team)
+        for school, teams in zip(schools, team_lists)
+        for team in (_obj_name(t, "team") for t in teams)
+        if team
+    ]
+
+
+def _fetch_rounds_many(pairs):
+    """fetch_rounds for each (school, team) concurrently; keeps input order."""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        all_rounds = list(pool.map(lambda st: fetch_rounds(*st), pairs))
+    return [(school, team, rounds) for (school, team), rounds in zip(pairs, all_rounds)]
+
+
 def resolve_targets():
     """Returns list of (school, team, rounds)."""
     results = []
@@ -256,58 +420,32 @@ def resolve_targets():
     if TARGET_MODE == "teams":
         for (school, team) in SPECIFIC_TEAMS:
             print(f"[→] {school} / {team}")
-            rounds = fetch_rounds(school, team)
-            results.append((school, team, rounds))
+        results = _fetch_rounds_many(list(SPECIFIC_TEAMS))
 
     elif TARGET_MODE == "school":
         for school in SPECIFIC_SCHOOLS:
             print(f"[→] School: {school}")
-            teams = fetch_teams_in_school(school)
-            for team_obj in teams:
-                team = team_obj if isinstance(team_obj, str) else team_obj.get("team", "")
-                if not team:
-                    continue
-                rounds = fetch_rounds(school, team)
-                results.append((school, team, rounds))
-                time.sleep(0.2)
+        results = _fetch_rounds_many(_school_team_pairs(SPECIFIC_SCHOOLS))
 
     elif TARGET_MODE == "recent":
         cutoff = datetime.utcnow() - timedelta(days=DAYS_RECENT)
         print(f"[→] Rounds uploaded since {cutoff.strftime('%Y-%m-%d')} ({DAYS_RECENT} days)...")
-        schools = fetch_all_schools()
-        for school_obj in schools:
-            school = school_obj if isinstance(school_obj, str) else school_obj.get("name", "")
-            if not school:
-                continue
-            for team_obj in fetch_teams_in_school(school):
-                team = team_obj if isinstance(team_obj, str) else team_obj.get("team", "")
-                if not team:
-                    continue
-                rounds = fetch_rounds(school, team)
-                recent = [r for r in rounds if _is_recent(r, cutoff)]
-                if recent:
-                    results.append((school, team, recent))
-            time.sleep(0.2)
+        schools = [_obj_name(s, "name") for s in fetch_all_schools()]
+        for (school, team, rounds) in _fetch_rounds_many(_school_team_pairs(schools)):
+            recent = [r for r in rounds if _is_recent(r, cutoff)]
+            if recent:
+                results.append((school, team, recent))
 
     elif TARGET_MODE == "topic":
         if not TOPIC_KEYWORDS:
             print("[!] topic mode requires TOPIC_KEYWORDS to be set!")
             return []
         print(f"[→] Topic scan: {TOPIC_KEYWORDS}")
-        schools = fetch_all_schools()
-        for school_obj in schools:
-            school = school_obj if isinstance(school_obj, str) else school_obj.get("name", "")
-            if not school:
-                continue
-            for team_obj in fetch_teams_in_school(school):
-                team = team_obj if isinstance(team_obj, str) else team_obj.get("team", "")
-                if not team:
-                    continue
-                rounds = fetch_rounds(school, team)
-                matching = [r for r in rounds if _matches_topic(r)]
-                if matching:
-                    results.append((school, team, matching))
-            time.sleep(0.2)
+        schools = [_obj_name(s, "name") for s in fetch_all_schools()]
+        for (school, team, rounds) in _fetch_rounds_many(_school_team_pairs(schools)):
+            matching = [r for r in rounds if _matches_topic(r)]
+            if matching:
+                results.append((school, team, matching))
 
     return results
 
@@ -342,27 +480,58 @@ def dedup_rounds(rounds):
 # ───────────────────────────────────────────────────────────────
 
 def download_file(path: str):
-    key = hashlib.md5(path.encode()).hexdigest()
-    cached = CACHE_DIR / f"{key}.docx"
+    """
+    Returns the local cache Path of the docx (downloading it if needed),
+    or None on failure. The merge opens the zip from disk and reads only
+    word/document.xml, so whole files never need to sit in memory.
+    """
+    cached = _cache_path(path, suffix=".docx")
     if cached.exists():
-        return cached.read_bytes()
+        return cached
 
-    print(f"    [↓] {Path(path).name}")
+    _log(f"    [↓] {Path(path).name}")
     for attempt in range(3):
         try:
+            _throttle()
             r = session.get(f"{API_BASE}/download", params={"path": path}, timeout=30)
+            _record_status(r.status_code)
             if r.status_code == 200 and r.content[:4] == b'PK\x03\x04':
                 cached.write_bytes(r.content)
-                time.sleep(0.6)
-                return r.content
+                return cached
             else:
                 time.sleep(2 ** attempt)
         except Exception:
             time.sleep(2 ** attempt)
-    print(f"    [!] Failed after 3 attempts: {Path(path).name}")
+    _log(f"    [!] Failed after 3 attempts: {Path(path).name}")
     return None
 
 
+def _file_digest(path: Path) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def dedup_by_content(downloaded):
+    """
+    Teams often disclose the same file under several paths. Keeps the
+    first (meta, path) per unique file content and records the other
+    sources on its meta["also"] so attribution still covers them.
+    """
+    first = {}
+    unique = []
+    for (meta, src_path) in downloaded:
+        digest = _file_digest(src_path)
+        if digest in first:
+            first[digest].setdefault("also", []).append(meta)
+            continue
+        first[digest] = meta
+        unique.append((meta, src_path))
+    return unique
+
+
 # ───────────────────────────────────────────────────────────────
 #  FORMAT-PRESERVING DOCX MERGE
 # ───────────────────────────────────────────────────────────────
@@ -397,19 +566,35 @@ def _add_rule(doc, color="3366AA"):
     pPr.append(pBdr)
 
 
-def copy_docx_into(src_bytes: bytes, dest_doc: Document, meta: dict) -> int:
+def _source_paragraphs(src_path: Path):
     """
-    Inserts attribution header then copies every paragraph from src_bytes
-    into dest_doc using raw XML copy for full format preservation.
+    Returns the top-level <w:p> elements of a docx body, read straight
+    from word/document.xml. Skips python-docx's full package load
+    (styles, numbering, media parts), none of which the merge uses.
+    """
+    with zipfile.ZipFile(src_path) as zf:
+        try:
+            xml = zf.read("word/document.xml")
+        except KeyError:
+            # Non-standard main part name — let python-docx resolve it
+            return [p._element for p in Document(str(src_path)).paragraphs]
+    body = parse_xml(xml).find(qn("w:body"))
+    return [] if body is None else list(body.iterchildren(qn("w:p")))
+
+
+def copy_docx_into(src_path: Path, dest_doc: Document, meta: dict) -> int:
+    """
+    Inserts attribution header then moves every paragraph from src_path
+    into dest_doc using raw XML for full format preservation.
     """
     try:
-        src = Document(io.BytesIO(src_bytes))
+        src_paras = _source_paragraphs(src_path)
     except Exception as e:
         print(f"    [!] Parse error: {e}")
         return 0
 
     side  = "AFF" if meta.get("side") == "A" else "NEG"
-    tourn = meta.get("tournament", "").lstrip("0123456789-– ").strip()
+    tourn = meta.get("tournament_clean", "")
     rnd   = meta.get("round", "")
     opp   = meta.get("opponent", "")
     judge = meta.get("judge", "")
@@ -431,19 +616,22 @@ def copy_docx_into(src_bytes: bytes, dest_doc: Document, meta: dict) -> int:
         _add_attr_paragraph(dest_doc,
             report.replace("\n", "  |  "),
             "999999", size_pt=8, space_after_pt=1)
+    for other in meta.get("also", []):
+        _add_attr_paragraph(dest_doc,
+            f"Also disclosed by {other.get('school','')} / {other.get('team','')}"
+            f"  ·  {other.get('tournament_clean','')}  —  Round {other.get('round','')}",
+            "999999", size_pt=8, space_after_pt=1)
     _add_attr_paragraph(dest_doc, f"File: {fname}",
                         "AAAAAA", size_pt=7, space_after_pt=3)
     _add_rule(dest_doc)
 
-    # Copy raw XML paragraphs
-    dest_body = dest_doc.element.body
-    insert_idx = len(dest_body) - 1  # before sectPr
-    count = 0
-    for para in src.paragraphs:
-        new_p = copy.deepcopy(para._element)
-        dest_body.insert(insert_idx, new_p)
-        insert_idx += 1
-        count += 1
+    # Move raw XML paragraphs (the source tree is discarded, so no copy).
+    # addprevious on the trailing sectPr is O(1); body.insert(idx, ...)
+    # walks idx children per call and the packet body only grows.
+    add_before_sectpr = dest_doc.element.body[-1].addprevious
+    for p in src_paras:
+        add_before_sectpr(p)
+    count = len(src_paras)
 
     dest_doc.add_paragraph()  # spacing between files
     return count
@@ -567,10 +755,13 @@ def main():
         for rnd in unique:
             if "opensource" not in rnd or not rnd["opensource"]:
                 continue
+            tournament = rnd.get("tournament", "")
             all_metas.append({
                 "school":     school,
                 "team":       team,
-                "tournament": rnd.get("tournament", ""),
+                "tournament": tournament,
+                # "12-Harvard" -> "Harvard"; used for grouping and attribution
+                "tournament_clean": tournament.lstrip("0123456789-– ").strip(),
                 "round":      rnd.get("round", ""),
                 "side":       rnd.get("side", ""),
                 "opponent":   rnd.get("opponent", ""),
@@ -580,12 +771,15 @@ def main():
                 "created_at": rnd.get("created_at", ""),
             })
 
-    print(f"\n[→] Downloading {len(all_metas)} files...\n")
-    downloaded = []
-    for meta in all_metas:
-        data = download_file(meta["opensource"])
-        if data:
-            downloaded.append((meta, data))
+    print(f"\n[→] Downloading {len(all_metas)} files ({MAX_WORKERS} workers)...\n")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        results = pool.map(download_file, [m["opensource"] for m in all_metas])
+        downloaded = [(meta, path) for meta, path in zip(all_metas, results) if path]
+
+    n_fetched = len(downloaded)
+    downloaded = dedup_by_content(downloaded)
+    if len(downloaded) < n_fetched:
+        print(f"\n[✓] {n_fetched - len(downloaded)} duplicate files merged")
 
     print(f"\n[✓] {len(downloaded)} files ready\n")
     if not downloaded:
@@ -614,17 +808,17 @@ def main():
 
     # Group by tournament
     by_tourn = defaultdict(list)
-    for (meta, data) in downloaded:
-        tourn = meta["tournament"].lstrip("0123456789-– ").strip() or "Unknown"
-        by_tourn[tourn].append((meta, data))
+    for (meta, src_path) in downloaded:
+        tourn = meta["tournament_clean"] or "Unknown"
+        by_tourn[tourn].append((meta, src_path))
 
     for tourn_name, entries in by_tourn.items():
         h = out_doc.add_heading(tourn_name, level=1)
         if h.runs:
             h.runs[0].font.color.rgb = RGBColor(0x1a, 0x5c, 0xa8)
 
-        for (meta, data) in entries:
-            n = copy_docx_into(data, out_doc, meta)
+        for (meta, src_path) in entries:
+            n = copy_docx_into(src_path, out_doc, meta)
             print(f"  ✓  {Path(meta['opensource']).name}  ({n} paragraphs)")
 
         out_doc.add_page_break()